@@ -1,3 +1,6 @@
+import threading
+import time
+from cachetools import TTLCache
 from rest_framework import authentication, exceptions
 from django.conf import settings
 from jose import jwt, JWTError
@@ -5,6 +8,42 @@ from jose import jwt, JWTError
 SECRET_KEY = settings.JWT_SECRET_KEY  # must match Auth Service
 ALGORITHM = settings.JWT_ALGORITHM
 
+# Decoded payloads keyed by raw token; TTL kept well below the access token lifetime
+_decode_cache = TTLCache(maxsize=4096, ttl=30)
+_decode_lock = threading.Lock()
+
+def _shop_id_set(payload):
+    """
+    Shop ids the token may manage, normalized once per decode.
+    Falls back to user_id when the token carries no shop_ids.
+    """
+    shop_ids = payload.get("shop_ids")
+    if not shop_ids:
+        shop_ids = [payload.get("user_id")]
+    elif isinstance(shop_ids, int):
+        shop_ids = [shop_ids]
+    try:
+        return frozenset(int(s) for s in shop_ids if s is not None)
+    except (TypeError, ValueError):
+        return frozenset()
+
+def _cached_decode(token):
+    """
+    Decode a JWT, reusing a recently verified payload for the same token.
+    Raises JWTError if the token is invalid or has expired.
+    """
+    with _decode_lock:
+        payload = _decode_cache.get(token)
+    if payload is None:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload["_shop_ids_set"] = _shop_id_set(payload)
+        with _decode_lock:
+            _decode_cache[token] = payload
+    elif "exp" in payload and payload["exp"] <= time.time():
+        # A cache hit must never outlive the token itself
+        raise JWTError("Signature has expired.")
+    return payload
+
 class JWTAuthentication(authentication.BaseAuthentication):
     """
     Custom JWT authentication for Product Service.
@@ -17,15 +56,16 @@ class JWTAuthentication(authentication.BaseAuthentication):
         if not auth_header:
             return None  # allows other auth classes / anonymous access
 
-        # Expecting header: "Bearer <token>"
-        parts = auth_header.split()
-        if len(parts) != 2 or parts[0].lower() != "bearer":
+        # Expecting header: "Bearer <token>"; sliced rather than split to avoid allocations
+        if len(auth_header) <= 7 or auth_header[:7].lower() != "bearer ":
             raise exceptions.AuthenticationFailed("Invalid Authorization header format.")
 
-        token = parts[1]
+        token = auth_header[7:].strip()
+        if not token or " " in token:
+            raise exceptions.AuthenticationFailed("Invalid Authorization header format.")
 
         try:
-            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+            payload = _cached_decode(token)
         except JWTError:
             raise exceptions.AuthenticationFailed("Invalid or expired token.")
 
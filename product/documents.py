@@ -0,0 +1,75 @@
+from django_elasticsearch_dsl import Document, fields
+from django_elasticsearch_dsl.registries import registry
+from .models import Product
+
+@registry.register_document
+class ProductDocument(Document):
+    name = fields.TextField()
+    description = fields.TextField()
+    shop_name = fields.TextField()
+    tags = fields.KeywordField(multi=True)
+    available = fields.BooleanField()
+    shop_point = fields.GeoPointField()
+
+    class Index:
+        name = "products"
+        settings = {"number_of_shards": 1, "number_of_replicas": 0}
+
+    class Django:
+        model = Product
+        fields = []
+
+    def prepare_shop_point(self, instance):
+        if instance.shop_lat is None or instance.shop_lng is None:
+            return None
+        return {"lat": instance.shop_lat, "lon": instance.shop_lng}
+
+
+class ProductSearchResults:
+    """
+    Lazy sequence over a product search. Slicing runs the query with the slice as
+    from/size and loads only those Products, so the paginator decides how many hits are fetched.
+    """
+
+    def __init__(self, search, with_distance):
+        self.search = search
+        self.with_distance = with_distance
+
+    def count(self):
+        return self.search.count()
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        hits = self.search[index].execute()
+        ids = [int(hit.meta.id) for hit in hits]
+        products = Product.objects.filter(available=True).defer('search_vector') \
+            .prefetch_related('images').in_bulk(ids)
+        results = []
+        for hit in hits:
+            product = products.get(int(hit.meta.id))
+            if product is None:
+                continue  # deleted or unavailable since it was indexed
+            if self.with_distance:
+                product.distance = hit.meta.sort[0]
+            results.append(product)
+        return results
+
+
+def search_products(q, lat, lng, radius_km):
+    """
+    Build a text and/or geo-distance search against the product index.
+    Returns a ProductSearchResults in relevance/distance order; each Product gets a
+    `distance` (km) attribute when a location was given.
+    """
+    s = ProductDocument.search().filter("term", available=True)
+    if q:
+        s = s.query("multi_match", query=q, fields=["name^2", "description", "tags", "shop_name"])
+    if lat is not None:
+        point = {"lat": lat, "lon": lng}
+        s = s.filter("geo_distance", distance=f"{radius_km}km", shop_point=point)
+        s = s.sort({"_geo_distance": {"shop_point": point, "order": "asc", "unit": "km"}})
+    return ProductSearchResults(s.source(False), with_distance=lat is not None)
@@ -0,0 +1,16 @@
+import django_filters
+from .models import Product
+
+class ProductFilter(django_filters.FilterSet):
+    """
+    Product list filters. `?tag=<tag>` matches products whose tags list contains the tag.
+    """
+    tag = django_filters.CharFilter(method='filter_tag')
+
+    class Meta:
+        model = Product
+        fields = ['category', 'price', 'sku', 'tag']
+
+    def filter_tag(self, queryset, name, value):
+        # jsonb @> containment, served by the GIN index on tags
+        return queryset.filter(tags__contains=[value])
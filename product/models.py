@@ -1,11 +1,16 @@
 import string
-import random
-from django.db import models
+import secrets
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
+from django.db import IntegrityError, models, transaction
 from django.utils import timezone
 
+SKU_ALPHABET = string.ascii_uppercase + string.digits
+SKU_MAX_ATTEMPTS = 5
+
 def generate_sku():
-    """Generate a random 8-character alphanumeric SKU."""
-    return ''.join(random.choices(string.ascii_uppercase + string.digits, k=8))
+    """Generate a random 12-character alphanumeric SKU."""
+    return ''.join(secrets.choice(SKU_ALPHABET) for _ in range(12))
 
 class Category(models.Model):
     name = models.CharField(max_length=100, unique=True)
@@ -34,17 +39,46 @@ class Product(models.Model):
     # Optional extra metadata for searching
     tags = models.JSONField(default=list, blank=True)  # e.g., ["leather", "sofa"]
 
+    # Weighted name/tags/description/shop_name tsvector, maintained by a DB trigger (migration 0005)
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            # Supports the bounding-box prefilter in the radius search
+            models.Index(fields=['shop_lat', 'shop_lng'], name='product_shop_latlng_idx'),
+            # Trigram index for substring / fuzzy name search
+            GinIndex(fields=['name'], name='product_name_trgm', opclasses=['gin_trgm_ops']),
+            GinIndex(fields=['search_vector'], name='product_search_vector_gin'),
+            GinIndex(fields=['tags'], name='product_tags_gin', opclasses=['jsonb_path_ops']),
+            # Default listing: available products, newest first
+            models.Index(fields=['-updated_at'], condition=models.Q(available=True), name='prod_avail_updated_partial'),
+            models.Index(fields=['category', 'price'], name='prod_category_price'),
+            models.Index(fields=['shop_id', 'available'], name='prod_shop_available'),
+        ]
+
     def save(self, *args, **kwargs):
-        if not self.sku:
-            sku = generate_sku()
-            while Product.objects.filter(sku=sku).exists():
-                sku = generate_sku()
-            self.sku = sku
-        super().save(*args, **kwargs)
+        if self.sku:
+            return super().save(*args, **kwargs)
+        # Let the UNIQUE constraint catch the (very unlikely) collision instead of querying first
+        for attempt in range(SKU_MAX_ATTEMPTS):
+            self.sku = generate_sku()
+            try:
+                with transaction.atomic():
+                    return super().save(*args, **kwargs)
+            except IntegrityError:
+                if attempt == SKU_MAX_ATTEMPTS - 1 or not generated_sku_collided([self.sku]):
+                    raise
 
     def __str__(self):
         return f"{self.name} — {self.shop_name}"
 
+def generated_sku_collided(skus):
+    """
+    After an IntegrityError, tell whether one of our auto-generated SKUs was taken (worth retrying)
+    rather than some other constraint failing (retrying would only repeat the error).
+    """
+    return Product.objects.filter(sku__in=skus).exists()
+
 class ProductImage(models.Model):
     product = models.ForeignKey(Product, related_name="images", on_delete=models.CASCADE)
     image = models.ImageField(upload_to="product_images/")
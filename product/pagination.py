@@ -0,0 +1,9 @@
+from rest_framework.pagination import PageNumberPagination
+
+class SearchPagination(PageNumberPagination):
+    """
+    Page-number pagination for /products/search/ so only one page of matches is loaded.
+    """
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
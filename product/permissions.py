@@ -19,16 +19,10 @@ class IsShopOwnerOfProduct(permissions.BasePermission):
     """
 
     def has_object_permission(self, request, view, obj):
+        if request.method in permissions.SAFE_METHODS:
+            return True
         user_payload = getattr(request, "user", None)
         if not user_payload or not isinstance(user_payload, dict):
             return False
-        # The JWT payload should contain user_id and optionally shop_ids
-        token_user_id = user_payload.get("user_id")
-        token_shop_ids = user_payload.get("shop_ids")
-        # If shop_ids present, check if product.shop_id is in the list
-        if token_shop_ids:
-            if isinstance(token_shop_ids, int):
-                token_shop_ids = [token_shop_ids]
-            return int(obj.shop_id) in [int(s) for s in token_shop_ids]
-        # Fallback: compare with user_id
-        return int(obj.shop_id) == int(token_user_id)
+        # JWTAuthentication normalizes shop_ids (or the user_id fallback) into a frozenset of ints
+        return obj.shop_id in user_payload.get("_shop_ids_set", frozenset())
@@ -2,6 +2,18 @@ from rest_framework import serializers
 from .models import Product, ProductImage, Category
 from django.conf import settings
 
+def absolute_url(url, context):
+    """
+    Make a storage URL absolute, preferring the per-request base_url from the view's serializer context.
+    """
+    if not url.startswith('/'):
+        return url  # already absolute (e.g. S3)
+    base_url = context.get('base_url')
+    if base_url:
+        return f"{base_url}{url}"
+    request = context.get('request')
+    return request.build_absolute_uri(url) if request else url
+
 class ProductImageSerializer(serializers.ModelSerializer):
     image = serializers.SerializerMethodField()
 
@@ -10,11 +22,9 @@ class ProductImageSerializer(serializers.ModelSerializer):
         fields = ("id", "image", "alt_text")
 
     def get_image(self, obj):
-        request = self.context.get('request')
-        if obj.image and hasattr(obj.image, 'url'):
-            # Return full URL if request is available
-            return request.build_absolute_uri(obj.image.url) if request else obj.image.url
-        return None
+        if not obj.image.name:
+            return None
+        return absolute_url(obj.image.url, self.context)
 
 class CategorySerializer(serializers.ModelSerializer):
     class Meta:
@@ -32,3 +42,84 @@ class ProductSerializer(serializers.ModelSerializer):
             "tags", "images", "created_at", "updated_at"
         )
         read_only_fields = ("shop_id", "shop_name", "shop_lat", "shop_lng", "created_at", "updated_at")
+
+class PreloadedCategoryField(serializers.PrimaryKeyRelatedField):
+    """
+    Category PK field that resolves against a {pk: Category} map preloaded into context["categories"],
+    so validating a list of products doesn't run one query per item.
+    """
+
+    def to_internal_value(self, data):
+        categories = self.context.get("categories")
+        if categories is None:
+            return super().to_internal_value(data)
+        if isinstance(data, bool):
+            self.fail("incorrect_type", data_type=type(data).__name__)
+        try:
+            pk = int(data)
+        except (TypeError, ValueError):
+            self.fail("incorrect_type", data_type=type(data).__name__)
+        category = categories.get(pk)
+        if category is None:
+            self.fail("does_not_exist", pk_value=data)
+        return category
+
+class ProductBulkSerializer(ProductSerializer):
+    """
+    ProductSerializer for bulk-create; SKU uniqueness is checked once per payload by the view
+    and categories come from the view's preloaded map.
+    """
+    category = PreloadedCategoryField(queryset=Category.objects.all(), allow_null=True, required=False)
+
+    class Meta(ProductSerializer.Meta):
+        extra_kwargs = {"sku": {"validators": []}}
+
+class ProductDistanceSerializer(ProductSerializer):
+    """ProductSerializer plus distance_km, read from a `distance` (km) annotation/attribute."""
+    distance_km = serializers.SerializerMethodField()
+
+    class Meta(ProductSerializer.Meta):
+        fields = ProductSerializer.Meta.fields + ("distance_km",)
+
+    def get_distance_km(self, obj):
+        distance = getattr(obj, "distance", None)
+        return round(distance, 3) if distance is not None else None
+
+
+class FastProductImageSerializer(serializers.Serializer):
+    """Read-only image serializer for ProductImage .values() rows."""
+    id = serializers.IntegerField()
+    image = serializers.SerializerMethodField()
+    alt_text = serializers.CharField()
+
+    def get_image(self, obj):
+        if not obj["image"]:
+            return None
+        return absolute_url(ProductImage._meta.get_field("image").storage.url(obj["image"]), self.context)
+
+class FastProductSerializer(serializers.Serializer):
+    """
+    Read-only product serializer for list pages.
+    Consumes .values() dicts (see VALUE_FIELDS) instead of model instances; output matches ProductSerializer.
+    """
+    VALUE_FIELDS = (
+        "id", "sku", "name", "description", "price", "category_id",
+        "available", "shop_id", "shop_name", "shop_lat", "shop_lng",
+        "tags", "created_at", "updated_at"
+    )
+
+    id = serializers.IntegerField()
+    sku = serializers.CharField()
+    name = serializers.CharField()
+    description = serializers.CharField()
+    price = serializers.DecimalField(max_digits=12, decimal_places=2)
+    category = serializers.IntegerField(source="category_id")
+    available = serializers.BooleanField()
+    shop_id = serializers.IntegerField()
+    shop_name = serializers.CharField()
+    shop_lat = serializers.FloatField()
+    shop_lng = serializers.FloatField()
+    tags = serializers.JSONField()
+    images = FastProductImageSerializer(many=True)
+    created_at = serializers.DateTimeField()
+    updated_at = serializers.DateTimeField()
@@ -1,3 +1,163 @@
-from django.test import TestCase
+import time
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from django.urls import reverse
+from jose import jwt
+from rest_framework import exceptions
+from rest_framework.test import APITestCase, APITransactionTestCase
+
+from .authentication import JWTAuthentication, _decode_cache
+from .models import Category, Product, ProductImage
+from .permissions import IsShopOwnerOfProduct
+
+OWNER_SHOP = {"id": 5, "name": "Test Shop", "latitude": 12.97, "longitude": 77.59}
+
+
+def make_token(**claims):
+    payload = {"user_id": 5, "role": "shop_owner", "type": "access", "exp": int(time.time()) + 300}
+    payload.update(claims)
+    return jwt.encode(payload, settings.JWT_SECRET_KEY, algorithm=settings.JWT_ALGORITHM)
+
+
+def authenticate(token):
+    request = RequestFactory().get("/", HTTP_AUTHORIZATION=f"Bearer {token}")
+    payload, _ = JWTAuthentication().authenticate(request)
+    return payload
+
+
+class JWTAuthenticationTests(SimpleTestCase):
+    def setUp(self):
+        _decode_cache.clear()
+
+    def test_cached_token_is_rejected_after_exp(self):
+        token = make_token()
+        payload = authenticate(token)  # decoded and cached
+        self.assertEqual(authenticate(token), payload)  # served from cache
+
+        with mock.patch("product.authentication.time.time", return_value=payload["exp"] + 1):
+            with self.assertRaises(exceptions.AuthenticationFailed):
+                authenticate(token)
+
+    def test_malformed_header_is_rejected(self):
+        for header in ("Bearer", "Bearer ", "Token abc", "Bearer a b"):
+            request = RequestFactory().get("/", HTTP_AUTHORIZATION=header)
+            with self.assertRaises(exceptions.AuthenticationFailed):
+                JWTAuthentication().authenticate(request)
+
+
+class IsShopOwnerOfProductTests(SimpleTestCase):
+    def setUp(self):
+        _decode_cache.clear()
+
+    def has_access(self, payload, shop_id, method="PUT"):
+        request = SimpleNamespace(method=method, user=payload)
+        return IsShopOwnerOfProduct().has_object_permission(request, None, Product(shop_id=shop_id))
+
+    def test_shop_ids_grant_and_deny(self):
+        payload = authenticate(make_token(user_id=1, shop_ids=[5, "7"]))
+        self.assertTrue(self.has_access(payload, 5))
+        self.assertTrue(self.has_access(payload, 7))
+        self.assertFalse(self.has_access(payload, 1))
+        self.assertFalse(self.has_access(payload, 9))
+
+    def test_single_int_shop_ids(self):
+        payload = authenticate(make_token(user_id=1, shop_ids=5))
+        self.assertTrue(self.has_access(payload, 5))
+        self.assertFalse(self.has_access(payload, 1))
+
+    def test_user_id_fallback_without_shop_ids(self):
+        payload = authenticate(make_token(user_id=5))
+        self.assertTrue(self.has_access(payload, 5))
+        self.assertFalse(self.has_access(payload, 6))
+
+    def test_anonymous_user_is_denied(self):
+        self.assertFalse(self.has_access(None, 5))
+
+    def test_safe_methods_are_allowed(self):
+        payload = authenticate(make_token(user_id=1, shop_ids=[5]))
+        self.assertTrue(self.has_access(payload, 9, method="GET"))
+
+
+# Batches are inserted on worker threads with their own DB connections, which only see committed rows
+@override_settings(ELASTICSEARCH_URL=None)
+@mock.patch("product.views.get_owner_shops", return_value=[OWNER_SHOP])
+class BulkCreateTests(APITransactionTestCase):
+    def setUp(self):
+        _decode_cache.clear()
+        self.url = reverse("product-bulk-create")
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {make_token()}")
+
+    def test_creates_products(self, get_owner_shops):
+        category = Category.objects.create(name="Furniture", slug="furniture")
+        items = [
+            {"name": "Chair", "price": "10.00", "category": category.pk, "sku": "CHAIR-1"},
+            {"name": "Table", "price": "25.50"},
+        ]
+        response = self.client.post(self.url, items, format="json")
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["created"], 2)
+        get_owner_shops.assert_called_once()
+        chair = Product.objects.get(sku="CHAIR-1")
+        self.assertEqual(chair.category, category)
+        self.assertEqual(chair.shop_id, OWNER_SHOP["id"])
+        self.assertTrue(Product.objects.get(name="Table").sku)
+
+    def test_rejects_duplicate_skus_in_payload(self, get_owner_shops):
+        items = [
+            {"name": "Chair", "price": "10.00", "sku": "DUP-1"},
+            {"name": "Other chair", "price": "12.00", "sku": "DUP-1"},
+        ]
+        response = self.client.post(self.url, items, format="json")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Product.objects.exists())
+
+    def test_rejects_existing_skus(self, get_owner_shops):
+        Product.objects.create(name="Old", price="1.00", sku="TAKEN-1", shop_id=5, shop_name="Test Shop")
+        response = self.client.post(self.url, [{"name": "New", "price": "2.00", "sku": "TAKEN-1"}], format="json")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Product.objects.count(), 1)
+
+    def test_rejects_unknown_category(self, get_owner_shops):
+        response = self.client.post(self.url, [{"name": "Chair", "price": "10.00", "category": 999}], format="json")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Product.objects.exists())
+
+
+@override_settings(AWS_STORAGE_BUCKET_NAME="test-bucket")
+@mock.patch("product.views.s3_object_exists", return_value=True)
+class RegisterImageTests(APITestCase):
+    def setUp(self):
+        _decode_cache.clear()
+        self.product = Product.objects.create(name="Chair", price="10.00", shop_id=5, shop_name="Test Shop")
+        self.url = reverse("product-register-image", args=[self.product.pk])
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {make_token(shop_ids=[5])}")
+
+    def test_accepts_key_under_product_prefix(self, s3_object_exists):
+        key = f"product_images/{self.product.pk}/abc.jpg"
+        response = self.client.post(self.url, {"key": key, "alt_text": "front"}, format="json")
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(ProductImage.objects.get(product=self.product).image.name, key)
+
+    def test_rejects_keys_outside_product_prefix(self, s3_object_exists):
+        other = self.product.pk + 1
+        for key in ("", "product_images/abc.jpg", f"product_images/{other}/abc.jpg",
+                    f"product_images/{self.product.pk}/../{other}/abc.jpg", "other/abc.jpg"):
+            response = self.client.post(self.url, {"key": key}, format="json")
+            self.assertEqual(response.status_code, 400, key)
+        self.assertFalse(ProductImage.objects.exists())
+
+    def test_rejects_key_that_was_never_uploaded(self, s3_object_exists):
+        s3_object_exists.return_value = False
+        key = f"product_images/{self.product.pk}/missing.jpg"
+        response = self.client.post(self.url, {"key": key}, format="json")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(ProductImage.objects.exists())
@@ -4,24 +4,62 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticatedOrReadOnly
 from rest_framework.parsers import JSONParser, MultiPartParser, FormParser
 from django_filters.rest_framework import DjangoFilterBackend
-from .models import Product, ProductImage
-from .serializers import ProductSerializer, ProductImageSerializer
+from django.conf import settings
+from django.core.cache import cache
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramWordSimilarity
+from django.db import DatabaseError, IntegrityError, connection, transaction
+from django.db.models import Value, prefetch_related_objects
+from django.db.models.functions import ASin, Cos, Least, Power, Radians, Sin, Sqrt
+from .models import Category, Product, ProductImage, SKU_MAX_ATTEMPTS, generate_sku, generated_sku_collided
+from .serializers import (
+    ProductSerializer, ProductBulkSerializer, ProductDistanceSerializer, ProductImageSerializer, FastProductSerializer
+)
 from .permissions import IsShopOwner, IsShopOwnerOfProduct
-from .jwt_utils import verify_access_token
+from .filters import ProductFilter
+from .pagination import SearchPagination
 from rest_framework.exceptions import AuthenticationFailed, PermissionDenied
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import hashlib
+import http.cookiejar
+import logging
 import math
+import os
+import uuid
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
 
 # URL of your ShopService
 SHOP_SERVICE_URL = "http://127.0.0.1:8001/api/shops/"  # adjust if deployed
+SHOP_SERVICE_TIMEOUT = (0.5, 1.5)  # (connect, read) seconds; never let a slow ShopService pin a worker thread
+OWNER_SHOPS_CACHE_TTL = 60  # seconds
+
+# Pooled keep-alive connections to ShopService, shared across requests in this process
+_shop_session = requests.Session()
+# The session is shared by every caller, so never persist ShopService cookies between users
+_shop_session.cookies.set_policy(http.cookiejar.DefaultCookiePolicy(allowed_domains=[]))
+_shop_adapter = HTTPAdapter(pool_connections=20, pool_maxsize=50,
+                            max_retries=Retry(total=2, backoff_factor=0.1, allowed_methods=["GET"]))
+_shop_session.mount("http://", _shop_adapter)
+_shop_session.mount("https://", _shop_adapter)
+
+EARTH_RADIUS_KM = 6371.0
+IMAGE_UPLOAD_WORKERS = 8
+IMAGE_UPLOAD_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.webp'}
+PRESIGNED_URL_EXPIRY = 300  # seconds
+BULK_CREATE_BATCH_SIZE = 200
+BULK_CREATE_WORKERS = 4
 
 class ProductViewSet(viewsets.ModelViewSet):
-    queryset = Product.objects.filter(available=True).order_by('-updated_at')
+    queryset = Product.objects.filter(available=True).defer('search_vector').prefetch_related('images') \
+        .order_by('-updated_at')
     serializer_class = ProductSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
-    filterset_fields = ['category', 'price', 'sku']
-    search_fields = ['name', 'description', 'tags', 'shop_name']
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
+    filterset_class = ProductFilter
     ordering_fields = ['price', 'updated_at']
     parser_classes = [JSONParser, MultiPartParser, FormParser]
 
@@ -30,18 +68,57 @@ class ProductViewSet(viewsets.ModelViewSet):
             return [IsShopOwner()]
         return super().get_permissions()
 
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        request = context.get('request')
+        if request:
+            # Resolved once per request; image URLs are built by string concatenation
+            context['base_url'] = f"{request.scheme}://{request.get_host()}"
+        return context
+
+    def filter_queryset(self, queryset):
+        """
+        Apply the standard filters, then full-text `?search=` against the indexed search_vector.
+        Results are ranked by relevance unless an explicit `?ordering=` is given.
+        """
+        queryset = super().filter_queryset(queryset)
+        q = self.request.query_params.get('search')
+        if q:
+            query = SearchQuery(q, config='english')
+            queryset = queryset.filter(search_vector=query)
+            if not self.request.query_params.get('ordering'):
+                queryset = queryset.annotate(rank=SearchRank('search_vector', query)).order_by('-rank')
+        return queryset
+
     def get_payload(self):
         """
-        Decode JWT token from request.auth and return payload dict.
+        Return the access-token payload already decoded by JWTAuthentication (request.user).
         """
-        token = getattr(self.request, "auth", None)  # JWT string
-        if not token:
+        payload = getattr(self.request, "user", None)
+        if not isinstance(payload, dict) or payload.get("type") != "access":
             return None
-        return verify_access_token(token)
+        return payload
 
 
 
-    def perform_create(self, serializer):
+    def list(self, request, *args, **kwargs):
+        # Read-only path: skip model hydration and serialize plain .values() rows
+        queryset = self.filter_queryset(self.get_queryset()) \
+            .prefetch_related(None) \
+            .values(*FastProductSerializer.VALUE_FIELDS)
+        page = self.paginate_queryset(queryset)
+        rows = list(page if page is not None else queryset)
+        attach_image_values(rows)
+
+        serializer = FastProductSerializer(rows, many=True, context=self.get_serializer_context())
+        if page is not None:
+            return self.get_paginated_response(serializer.data)
+        return Response(serializer.data)
+
+    def get_shop_fields(self):
+        """
+        Resolve the requesting owner's shop via ShopService and return the snapshot fields.
+        """
         payload = self.get_payload()
         if not payload:
             from rest_framework.exceptions import AuthenticationFailed
@@ -61,13 +138,81 @@ class ProductViewSet(viewsets.ModelViewSet):
             raise PermissionDenied("No shop found for this owner")
 
         shop = shops[0]  # pick first shop for now
-        serializer.save(
-            shop_id=shop["id"],
-            shop_name=shop["name"],
-            shop_lat=shop.get("latitude"),
-            shop_lng=shop.get("longitude")
-        )
+        return {
+            "shop_id": shop["id"],
+            "shop_name": shop["name"],
+            "shop_lat": shop.get("latitude"),
+            "shop_lng": shop.get("longitude"),
+        }
+
+    def perform_create(self, serializer):
+        serializer.save(**self.get_shop_fields())
+
+    @action(detail=False, methods=['post'], url_path='bulk-create')
+    def bulk_create(self, request):
+        if not isinstance(request.data, list) or not request.data:
+            return Response({"detail": "Expected a non-empty list of products"}, status=status.HTTP_400_BAD_REQUEST)
 
+        # Resolve every referenced category in one query instead of one per item
+        category_ids = set()
+        for item in request.data:
+            try:
+                category_ids.add(int(item.get("category")))
+            except (AttributeError, TypeError, ValueError):
+                pass
+        context = self.get_serializer_context()
+        context["categories"] = Category.objects.in_bulk(category_ids)
+
+        serializer = ProductBulkSerializer(data=request.data, many=True, context=context)
+        serializer.is_valid(raise_exception=True)
+
+        # SKU uniqueness is checked once for the whole payload rather than one SELECT per item
+        skus = [item["sku"] for item in serializer.validated_data if item.get("sku")]
+        duplicates = sorted(sku for sku, n in Counter(skus).items() if n > 1)
+        if duplicates:
+            return Response({"sku": [f"Duplicate SKUs in payload: {', '.join(duplicates)}"]},
+                            status=status.HTTP_400_BAD_REQUEST)
+        existing = sorted(Product.objects.filter(sku__in=skus).values_list('sku', flat=True))
+        if existing:
+            return Response({"sku": [f"SKUs already exist: {', '.join(existing)}"]},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        shop_fields = self.get_shop_fields()  # one ShopService call for the whole catalog
+        products = [Product(**item, **shop_fields) for item in serializer.validated_data]
+
+        # Insert in independent batches so one bad batch doesn't roll back the rest
+        batches = [products[i:i + BULK_CREATE_BATCH_SIZE] for i in range(0, len(products), BULK_CREATE_BATCH_SIZE)]
+        inserted, results = {}, []
+        with ThreadPoolExecutor(max_workers=min(len(batches), BULK_CREATE_WORKERS)) as executor:
+            futures = {executor.submit(insert_product_batch, batch): i for i, batch in enumerate(batches)}
+            for future in as_completed(futures):
+                index = futures[future]
+                try:
+                    inserted[index] = future.result()
+                except DatabaseError:
+                    logger.exception("Bulk create batch %s failed", index)
+                    results.append({"batch": index, "error": "Could not insert this batch"})
+                    continue
+                results.append({"batch": index, "created": len(inserted[index])})
+
+        results.sort(key=lambda r: r["batch"])
+        created = [p for index in sorted(inserted) for p in inserted[index]]
+        if created and settings.ELASTICSEARCH_URL:
+            # bulk_create sends no post_save, so the real-time index processor never sees these rows
+            from .documents import ProductDocument
+            try:
+                ProductDocument().update(created)
+            except Exception:
+                # Rows are committed; a failed index update is repaired by a reindex, not a client retry
+                logger.exception("Indexing %d bulk-created products failed", len(created))
+        prefetch_related_objects(created, 'images')
+        data = {
+            "created": len(created),
+            "batches": results,
+            "results": ProductSerializer(created, many=True, context=self.get_serializer_context()).data,
+        }
+        failed = any("error" in r for r in results)
+        return Response(data, status=status.HTTP_207_MULTI_STATUS if failed else status.HTTP_201_CREATED)
 
     def perform_update(self, serializer):
         obj = self.get_object()
@@ -76,54 +221,67 @@ class ProductViewSet(viewsets.ModelViewSet):
             raise PermissionDenied("You can't modify products of other shops.")
         serializer.save()
 
-    @action(detail=False, methods=['get'], url_path='search')
+    @action(detail=False, methods=['get'], url_path='search', pagination_class=SearchPagination)
     def search(self, request):
         q = request.query_params.get('q')
         lat = request.query_params.get('lat')
         lng = request.query_params.get('lng')
         radius_km = float(request.query_params.get('radius_km') or 5.0)
-        qs = Product.objects.filter(available=True)
-
-        if q:
-            qs = qs.filter(name__icontains=q)
 
         if lat and lng:
             try:
                 lat = float(lat)
                 lng = float(lng)
-                R = 6371.0  # Earth radius in km
-                results = []
-
-                for p in qs:
-                    if p.shop_lat is None or p.shop_lng is None:
-                        continue
-                    lat1 = math.radians(lat)
-                    lng1 = math.radians(lng)
-                    lat2 = math.radians(p.shop_lat)
-                    lng2 = math.radians(p.shop_lng)
-                    dlat = lat2 - lat1
-                    dlng = lng2 - lng1
-                    a = math.sin(dlat / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin(dlng / 2) ** 2
-                    c = 2 * math.asin(min(1, math.sqrt(a)))
-                    distance = R * c
-                    if distance <= radius_km:
-                        results.append((p, distance))
-
-                results.sort(key=lambda x: x[1])
-                serializer = ProductSerializer([r[0] for r in results], many=True, context={'request': request})
-                data = serializer.data
-                for i, (_, dist) in enumerate(results):
-                    data[i]['distance_km'] = round(dist, 3)
-                return Response(data)
-            except Exception:
+            except ValueError:
                 return Response({"detail": "Invalid lat/lng"}, status=status.HTTP_400_BAD_REQUEST)
+        else:
+            lat = lng = None
+
+        if settings.ELASTICSEARCH_URL:
+            return self.search_index(request, q, lat, lng, radius_km)
+
+        qs = Product.objects.filter(available=True).defer('search_vector').prefetch_related('images') \
+            .order_by('-updated_at')
+
+        if q:
+            # The %> word-similarity operator is served by the pg_trgm GIN index on name
+            qs = qs.filter(name__trigram_word_similar=q) \
+                .annotate(similarity=TrigramWordSimilarity(q, 'name')) \
+                .order_by('-similarity')
+
+        if lat is not None:
+            # Cheap indexed bounding-box prefilter, then exact haversine in the DB
+            min_lat, max_lat, min_lng, max_lng = bounding_box(lat, lng, radius_km)
+            qs = qs.filter(shop_lat__range=(min_lat, max_lat))
+            if min_lng is not None:
+                qs = qs.filter(shop_lng__range=(min_lng, max_lng))
+            qs = qs.annotate(distance=haversine_distance(lat, lng)) \
+                .filter(distance__lte=radius_km) \
+                .order_by('distance')
+
+        return self.paginated_search_response(qs, with_distance=lat is not None)
+
+    def search_index(self, request, q, lat, lng, radius_km):
+        """
+        Text + geo search served from Elasticsearch; only the requested page of hits is mapped back to Products.
+        """
+        from .documents import search_products
 
-        page = self.paginate_queryset(qs)
+        results = search_products(q, lat, lng, radius_km)
+        return self.paginated_search_response(results, with_distance=lat is not None)
+
+    def paginated_search_response(self, results, with_distance):
+        """
+        Serialize one page of search results; distance_km comes from each row's `distance`.
+        """
+        serializer_class = ProductDistanceSerializer if with_distance else ProductSerializer
+        context = self.get_serializer_context()
+        page = self.paginate_queryset(results)
         if page is not None:
-            serializer = ProductSerializer(page, many=True, context={'request': request})
+            serializer = serializer_class(page, many=True, context=context)
             return self.get_paginated_response(serializer.data)
 
-        serializer = ProductSerializer(qs, many=True, context={'request': request})
+        serializer = serializer_class(results, many=True, context=context)
         return Response(serializer.data)
 
     @action(detail=False, methods=['post'], url_path='image-search')
@@ -132,8 +290,9 @@ class ProductViewSet(viewsets.ModelViewSet):
         if not image:
             return Response({"detail": "No image uploaded"}, status=status.HTTP_400_BAD_REQUEST)
         matches = call_image_search_service(image)
-        products = Product.objects.filter(id__in=matches, available=True)
-        serializer = ProductSerializer(products, many=True, context={'request': request})
+        products = Product.objects.filter(id__in=matches, available=True).defer('search_vector') \
+            .prefetch_related('images')
+        serializer = ProductSerializer(products, many=True, context=self.get_serializer_context())
         return Response(serializer.data)
 
     @action(detail=True, methods=['post'], url_path='upload-image',
@@ -145,7 +304,7 @@ class ProductViewSet(viewsets.ModelViewSet):
         if not image_file:
             return Response({"detail": "No image uploaded"}, status=status.HTTP_400_BAD_REQUEST)
         img = ProductImage.objects.create(product=product, image=image_file, alt_text=alt_text)
-        serializer = ProductImageSerializer(img, context={'request': request})
+        serializer = ProductImageSerializer(img, context=self.get_serializer_context())
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     @action(detail=True, methods=['post'], url_path='upload-images',
@@ -156,12 +315,58 @@ class ProductViewSet(viewsets.ModelViewSet):
         alt_texts = request.data.getlist('alt_texts')
         if not images:
             return Response({"detail": "No images uploaded"}, status=status.HTTP_400_BAD_REQUEST)
-        created_images = []
-        for i, image_file in enumerate(images):
-            alt_text = alt_texts[i] if i < len(alt_texts) else ''
-            img = ProductImage.objects.create(product=product, image=image_file, alt_text=alt_text)
-            created_images.append(img)
-        serializer = ProductImageSerializer(created_images, many=True, context={'request': request})
+        objs = [
+            ProductImage(product=product, alt_text=alt_texts[i] if i < len(alt_texts) else '')
+            for i in range(len(images))
+        ]
+
+        def store(pair):
+            img, image_file = pair
+            img.image.save(image_file.name, image_file, save=False)
+
+        # Overlap the storage writes, then insert every row in a single query
+        with ThreadPoolExecutor(max_workers=min(len(objs), IMAGE_UPLOAD_WORKERS)) as executor:
+            list(executor.map(store, zip(objs, images)))
+        created_images = ProductImage.objects.bulk_create(objs)
+        serializer = ProductImageSerializer(created_images, many=True, context=self.get_serializer_context())
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    @action(detail=True, methods=['post'], url_path='upload-image-url',
+            permission_classes=[IsShopOwnerOfProduct])
+    def upload_image_url(self, request, pk=None):
+        """
+        Return a presigned S3 PUT URL so the client uploads image bytes straight to the bucket.
+        """
+        product = self.get_object()
+        if not settings.AWS_STORAGE_BUCKET_NAME:
+            return Response({"detail": "Direct uploads are not configured"}, status=status.HTTP_400_BAD_REQUEST)
+        ext = os.path.splitext(request.data.get('filename', ''))[1].lower()
+        if ext not in IMAGE_UPLOAD_EXTENSIONS:
+            ext = '.jpg'
+        key = f"{image_key_prefix(product)}{uuid.uuid4().hex}{ext}"
+        url = get_s3_client().generate_presigned_url(
+            'put_object',
+            Params={'Bucket': settings.AWS_STORAGE_BUCKET_NAME, 'Key': key},
+            ExpiresIn=PRESIGNED_URL_EXPIRY,
+        )
+        return Response({"url": url, "key": key})
+
+    @action(detail=True, methods=['post'], url_path='register-image',
+            permission_classes=[IsShopOwnerOfProduct])
+    def register_image(self, request, pk=None):
+        """
+        Create a ProductImage for a file already uploaded via upload-image-url; no bytes pass through here.
+        """
+        product = self.get_object()
+        key = request.data.get('key') or ''
+        if not settings.AWS_STORAGE_BUCKET_NAME:
+            return Response({"detail": "Direct uploads are not configured"}, status=status.HTTP_400_BAD_REQUEST)
+        if not key.startswith(image_key_prefix(product)) or '..' in key:
+            return Response({"detail": "Invalid image key"}, status=status.HTTP_400_BAD_REQUEST)
+        if not s3_object_exists(key):
+            return Response({"detail": "Image has not been uploaded"}, status=status.HTTP_400_BAD_REQUEST)
+        img = ProductImage.objects.create(product=product, image=key, alt_text=request.data.get('alt_text', ''))
+        serializer = ProductImageSerializer(img, context=self.get_serializer_context())
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
 
@@ -172,18 +377,114 @@ def call_image_search_service(image_file):
     """
     return []
 
+def image_key_prefix(product):
+    """
+    Storage key prefix for directly uploaded images of a product (matches ProductImage.upload_to).
+    """
+    return f"product_images/{product.pk}/"
+
+_s3_client = None
+
+def get_s3_client():
+    global _s3_client
+    if _s3_client is None:
+        import boto3
+        _s3_client = boto3.client('s3', region_name=settings.AWS_S3_REGION_NAME)
+    return _s3_client
+
+def s3_object_exists(key):
+    from botocore.exceptions import ClientError
+
+    try:
+        get_s3_client().head_object(Bucket=settings.AWS_STORAGE_BUCKET_NAME, Key=key)
+    except ClientError as exc:
+        if exc.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+            return False
+        raise
+    return True
+
+def attach_image_values(rows):
+    """
+    Fetch images for a list of product .values() rows in one query and attach them as row["images"].
+    """
+    images = defaultdict(list)
+    image_rows = ProductImage.objects.filter(product_id__in=[row["id"] for row in rows]) \
+        .values("id", "product_id", "image", "alt_text")
+    for image in image_rows:
+        images[image["product_id"]].append(image)
+    for row in rows:
+        row["images"] = images[row["id"]]
+
+def insert_product_batch(products):
+    """
+    Insert one batch of products in its own transaction, regenerating auto-assigned SKUs on collision.
+    Runs on a worker thread, so the thread's DB connection is closed when done.
+    """
+    generated = [p for p in products if not p.sku]
+    try:
+        for attempt in range(SKU_MAX_ATTEMPTS):
+            for p in generated:
+                p.sku = generate_sku()
+            try:
+                with transaction.atomic():
+                    return Product.objects.bulk_create(products)
+            except IntegrityError:
+                # Only a collision on one of our generated SKUs is worth retrying
+                if attempt == SKU_MAX_ATTEMPTS - 1 or not generated_sku_collided([p.sku for p in generated]):
+                    raise
+    finally:
+        connection.close()
+
+def bounding_box(lat, lng, radius_km):
+    """
+    Return (min_lat, max_lat, min_lng, max_lng) enclosing a circle of radius_km.
+    Longitude bounds are None when the box wraps a pole or the antimeridian.
+    """
+    dlat = math.degrees(radius_km / EARTH_RADIUS_KM)
+    min_lat, max_lat = lat - dlat, lat + dlat
+    if min_lat <= -90 or max_lat >= 90:
+        return max(min_lat, -90.0), min(max_lat, 90.0), None, None
+    dlng = math.degrees(radius_km / (EARTH_RADIUS_KM * math.cos(math.radians(lat))))
+    min_lng, max_lng = lng - dlng, lng + dlng
+    if min_lng < -180 or max_lng > 180:
+        return min_lat, max_lat, None, None
+    return min_lat, max_lat, min_lng, max_lng
+
+def haversine_distance(lat, lng):
+    """
+    Database expression for the great-circle distance (km) from (lat, lng) to the shop.
+    """
+    lat1 = math.radians(lat)
+    lng1 = math.radians(lng)
+    lat2 = Radians('shop_lat')
+    dlat = lat2 - lat1
+    dlng = Radians('shop_lng') - lng1
+    a = Power(Sin(dlat / 2), 2) + math.cos(lat1) * Cos(lat2) * Power(Sin(dlng / 2), 2)
+    return 2 * EARTH_RADIUS_KM * ASin(Least(Value(1.0), Sqrt(a)))
+
 def get_owner_shops(user_id, token):
         """
         Call ShopService to fetch shops for this owner.
+        Non-empty results are cached briefly per (user_id, token) to spare bulk uploads the round trip.
         """
+        token_hash = hashlib.sha256(str(token).encode()).hexdigest()[:16]
+        cache_key = f"owner_shops:{user_id}:{token_hash}"
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return cached
+
         headers = {"Authorization": f"Bearer {token}"}
         try:
-            resp = requests.get(f"{SHOP_SERVICE_URL}?owner_id={user_id}", headers=headers)
+            resp = _shop_session.get(f"{SHOP_SERVICE_URL}?owner_id={user_id}", headers=headers,
+                                     timeout=SHOP_SERVICE_TIMEOUT)
             if resp.status_code != 200:
                 raise PermissionDenied("Could not fetch shops from ShopService")
             data = resp.json()
             if isinstance(data, dict) and "results" in data:
-                return data["results"]  # DRF paginated response
-            return data  # normal list
+                data = data["results"]  # DRF paginated response
         except Exception:
-            raise PermissionDenied("ShopService unavailable")
\ No newline at end of file
+            raise PermissionDenied("ShopService unavailable")
+
+        if data:
+            cache.set(cache_key, data, OWNER_SHOPS_CACHE_TTL)
+        return data